@@ -28,6 +28,11 @@ URL = "https://coinmarketcap.com/"
 TOP_N = 100
 OUTPUT_CSV_FILENAME = "scraper.csv"
 LOGGER_NAME = "scraper_app"
+CURRENCY_PATTERN = re.compile(r"[$|,]")  # strip '$' symbol and ',' symbols
+PERCENT_PATTERN = re.compile(r"[%]")  # strip '%' symbol
+SUPPLY_PATTERN = re.compile(r"[A-Z|\s|,]")  # strip ',' symbols, whitespace and coin symbol
+BATCH_SEPARATOR = "\x00"  # joins a column of cells; not matched by any pattern above
+MARKET_CAP_TOLERANCE = 0.05  # allowed relative error of price * supply against market cap
 
 
 def logger_helper():
@@ -70,6 +75,7 @@ def initialize_database(conn):
                                     market_cap_USD INTEGER,
                                     volume24h_USD INTEGER,
                                     circulating_supply INTEGER,
+                                    flagged INTEGER,
                                     cryptocurrencies_id INTEGER NOT NULL,
                                     FOREIGN KEY (cryptocurrencies_id) REFERENCES cryptocurrencies (id)
                                 ); """
@@ -77,6 +83,10 @@ def initialize_database(conn):
     cur = conn.cursor()
     cur.execute(sql_create_cryptocurrencies_table)
     cur.execute(sql_create_market_data_table)
+    # databases created before the 'flagged' column existed need it added
+    market_data_columns = [row[1] for row in cur.execute("PRAGMA table_info(market_data)").fetchall()]
+    if "flagged" not in market_data_columns:
+        cur.execute("ALTER TABLE market_data ADD COLUMN flagged INTEGER")
     conn.commit()
 
 def db_helper():
@@ -275,6 +285,146 @@ def get_coin_symbol(columns):
         result = None
     return result
 
+def get_coin_price_text(columns):
+    """Extracts raw coin price text.
+
+    Args:
+        columns: BeautifulSoup Tag object containing columns for
+        row of interest.
+
+    Returns:
+        A string containing the unparsed price cell, e.g. '$1,234.56'.
+
+    Raises:
+        IndexError, AttributeError: if the cell cannot be found.
+    """
+    return columns[3].find('a').text
+
+def get_coin_change_text(column):
+    """Extracts raw signed percent change text.
+
+    The sign of a change is only given by the class of a nested span,
+    so it is prepended to the cell text here, e.g. '-1.23%'.
+
+    Args:
+        column: BeautifulSoup Tag object containing the change cell.
+
+    Returns:
+        A string containing the unparsed, signed percent change.
+
+    Raises:
+        IndexError, AttributeError: if the cell cannot be found.
+    """
+    sign = "" if "up" in column.find('span').find('span')['class'][0] else "-"
+    return sign + column.text.strip()
+
+def get_coin_change24h_text(columns):
+    """Extracts raw coin 24h % text.
+
+    Args:
+        columns: BeautifulSoup Tag object containing columns for
+        row of interest.
+
+    Returns:
+        A string containing the unparsed, signed 24h % cell.
+
+    Raises:
+        IndexError, AttributeError: if the cell cannot be found.
+    """
+    return get_coin_change_text(columns[4])
+
+def get_coin_change7d_text(columns):
+    """Extracts raw coin 7d % text.
+
+    Args:
+        columns: BeautifulSoup Tag object containing columns for
+        row of interest.
+
+    Returns:
+        A string containing the unparsed, signed 7d % cell.
+
+    Raises:
+        IndexError, AttributeError: if the cell cannot be found.
+    """
+    return get_coin_change_text(columns[5])
+
+def get_coin_market_cap_text(columns):
+    """Extracts raw coin market cap text.
+
+    Args:
+        columns: BeautifulSoup Tag object containing columns for
+        row of interest.
+
+    Returns:
+        A string containing the unparsed market cap cell.
+
+    Raises:
+        IndexError: if the cell cannot be found.
+    """
+    return columns[6].findChildren('span')[-1].text
+
+def get_coin_volume24h_text(columns):
+    """Extracts raw coin Volume(24h) text.
+
+    Args:
+        columns: BeautifulSoup Tag object containing columns for
+        row of interest.
+
+    Returns:
+        A string containing the unparsed Volume(24h) cell.
+
+    Raises:
+        IndexError, AttributeError: if the cell cannot be found.
+    """
+    return columns[7].find('a').find('p').text
+
+def get_coin_circulating_supply_text(columns):
+    """Extracts raw coin circulating supply text.
+
+    Args:
+        columns: BeautifulSoup Tag object containing columns for
+        row of interest.
+
+    Returns:
+        A string containing the unparsed circulating supply cell,
+        e.g. '18,724,512 BTC'.
+
+    Raises:
+        IndexError, AttributeError: if the cell cannot be found.
+    """
+    return columns[8].find('p').text
+
+# key: (raw text extractor, strip pattern, cast) for each numeric field, in output order
+NUMERIC_FIELDS = {
+    "price(USD)": (get_coin_price_text, CURRENCY_PATTERN, float),
+    "change24h": (get_coin_change24h_text, PERCENT_PATTERN, float),
+    "change7d": (get_coin_change7d_text, PERCENT_PATTERN, float),
+    "market_cap(USD)": (get_coin_market_cap_text, CURRENCY_PATTERN, int),
+    "volume24h(USD)": (get_coin_volume24h_text, CURRENCY_PATTERN, int),
+    "circulating_supply": (get_coin_circulating_supply_text, SUPPLY_PATTERN, int),
+}
+
+def parse_coin_numeric_field(columns, key):
+    """Parses a numeric field of a single row.
+
+    Parses the field named by key using the extractor, pattern and
+    cast listed for it in NUMERIC_FIELDS.
+
+    Args:
+        columns: BeautifulSoup Tag object containing columns for
+        row of interest.
+        key: a key of NUMERIC_FIELDS.
+
+    Returns:
+        The parsed value for the coin for that row.
+
+    Raises:
+        ValueError, IndexError, AttributeError: if the cell cannot be
+        found or cast.
+    """
+    extractor, pattern, cast = NUMERIC_FIELDS[key]
+    return cast(pattern.sub("", extractor(columns)))
+
 def get_coin_price(columns):
     """Parses coin price.
 
@@ -290,10 +440,7 @@ def get_coin_price(columns):
     """
     logger = logging.getLogger(LOGGER_NAME)
     try:
-        column = columns[3].find('a')
-        price = column.text
-        price = re.sub(r"[$|,]","",price)  # strip the '$' symbol and ',' symbols
-        result = float(price)
+        result = parse_coin_numeric_field(columns, "price(USD)")
         logger.debug("Get Coin Price complete.")
     except (ValueError, IndexError, AttributeError):
         logger.error("Could not parse Coin Price.")
@@ -315,12 +462,7 @@ def get_coin_change24h(columns):
     """
     logger = logging.getLogger(LOGGER_NAME)
     try:
-        column = columns[4]
-        change24h_sign = 1 if "up" in column.find('span').find('span')['class'][0] else -1
-        change24h = column.text
-        change24h = re.sub(r"[%]","",change24h)  # strip '%' symbol
-        change24h = float(change24h)
-        result = change24h_sign * change24h
+        result = parse_coin_numeric_field(columns, "change24h")
         logger.debug("Get Coin Change24h complete.")
     except (ValueError, IndexError, AttributeError):
         logger.error("Could not parse Coin 24h %.")
@@ -342,12 +484,7 @@ def get_coin_change7d(columns):
     """
     logger = logging.getLogger(LOGGER_NAME)
     try:
-        column = columns[5]
-        change7d_sign = 1 if "up" in column.find('span').find('span')['class'][0] else -1
-        change7d = column.text
-        change7d = re.sub(r"[%]","",change7d)  # strip '%' symbol
-        change7d = float(change7d)
-        result = change7d_sign * change7d
+        result = parse_coin_numeric_field(columns, "change7d")
         logger.debug("Get Coin Change7d complete.")
     except (ValueError, IndexError, AttributeError):
         logger.error("Could not parse Coin 7d %.")
@@ -369,10 +506,7 @@ def get_coin_market_cap(columns):
     """
     logger = logging.getLogger(LOGGER_NAME)
     try:
-        column = columns[6].findChildren('span')
-        market_cap = column[-1].text
-        market_cap = re.sub(r"[$|,]","",market_cap)  # strip '$' symbol and ',' symbols
-        result = int(market_cap)
+        result = parse_coin_numeric_field(columns, "market_cap(USD)")
         logger.debug("Get Coin Market Cap complete.")
     except (ValueError, IndexError):
         logger.error("Could not parse Coin Market Cap.")
@@ -394,10 +528,7 @@ def get_coin_volume24h(columns):
     """
     logger = logging.getLogger(LOGGER_NAME)
     try:
-        column = columns[7].find('a').find('p')
-        volume24h = column.text
-        volume24h = re.sub(r"[$|,]","",volume24h)  # strip '$' symbol and ',' symbols
-        result = int(volume24h)
+        result = parse_coin_numeric_field(columns, "volume24h(USD)")
         logger.debug("Get Coin Volume24h complete.")
     except (ValueError, IndexError, AttributeError):
         logger.error("Could not parse Coin Volume (24h).")
@@ -419,22 +550,167 @@ def get_coin_circulating_supply(columns):
     """
     logger = logging.getLogger(LOGGER_NAME)
     try:
-        column = columns[8].find('p')
-        circulating_supply = column.text
-        circulating_supply = re.sub(r'[A-Z|\s|,]','',circulating_supply)  # strip ',' symbols, whitespace and coin symbol
-        result = int(circulating_supply)
+        result = parse_coin_numeric_field(columns, "circulating_supply")
         logger.debug("Get Coin Circulating Supply complete.")
     except (ValueError, IndexError, AttributeError):
         logger.error("Could not cast Circulating Supply.")
         result = None
     return result
 
+def get_raw_coin_cells(columns):
+    """Extracts the raw cells of a row.
+
+    Extracts the name, symbol and unparsed numeric cell text for
+    a row so that the numeric cells can be normalised as a batch
+    by normalize_coin_data.
+
+    Args:
+        columns: BeautifulSoup Tag object containing columns for
+        row of interest.
+
+    Returns:
+        A dictionary keyed like the coin data dictionaries, holding
+        strings or None where a cell could not be found.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    result = {}
+    result["name"] = get_coin_name(columns)
+    result["symbol"] = get_coin_symbol(columns)
+    for key, (extractor, _, _) in NUMERIC_FIELDS.items():
+        try:
+            result[key] = extractor(columns)
+        except (IndexError, AttributeError):
+            logger.error("Could not find " + key + " cell.")
+            result[key] = None
+    return result
+
+def normalize_column(texts, pattern, cast):
+    """Converts a column of raw cell strings.
+
+    The whole column is joined and stripped with a single call to
+    the compiled pattern, then each cell is cast. Cells that are
+    None or cannot be cast become None.
+
+    Args:
+        texts: list of strings (or None) for one field of a snapshot.
+        pattern: compiled regular expression of characters to strip.
+        cast: float or int.
+
+    Returns:
+        A list of parsed values, the same length as texts.
+    """
+    joined = BATCH_SEPARATOR.join("" if text is None else text for text in texts)
+    result = []
+    for cell in pattern.sub("", joined).split(BATCH_SEPARATOR):
+        try:
+            result.append(cast(cell))
+        except ValueError:
+            result.append(None)
+    return result
+
+def normalize_coin_data(raw_rows):
+    """Converts a snapshot of raw cells into coin data.
+
+    Normalises each numeric field column by column rather than
+    cell by cell.
+
+    Args:
+        raw_rows: list of dictionaries as returned by get_raw_coin_cells.
+
+    Returns:
+        A list of dictionaries where each dictionary
+        contains data related to a single coin.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    result = [{"name": row["name"], "symbol": row["symbol"]} for row in raw_rows]
+    for key, (_, pattern, cast) in NUMERIC_FIELDS.items():
+        texts = [row[key] for row in raw_rows]
+        values = normalize_column(texts, pattern, cast)
+        for index, (text, value) in enumerate(zip(texts, values)):
+            if text is not None and value is None:
+                logger.error("Could not parse " + key + " for row " + str(index) + ".")
+            result[index][key] = value
+    logger.debug("Normalize Coin Data complete.")
+    return result
+
+def find_rank_order_outliers(market_caps):
+    """Finds market caps that break rank order.
+
+    Keeps a longest non-increasing subsequence of market_caps and
+    reports the positions left out of it, so that a single row that
+    is too high or too low is reported on its own rather than
+    every row after it.
+
+    Args:
+        market_caps: list of market caps in rank order.
+
+    Returns:
+        A list of positions in market_caps that break rank order.
+    """
+    lengths = [1] * len(market_caps)
+    previous = [None] * len(market_caps)
+    for i in range(len(market_caps)):
+        for j in range(i):
+            if market_caps[j] >= market_caps[i] and lengths[j] + 1 > lengths[i]:
+                lengths[i] = lengths[j] + 1
+                previous[i] = j
+    kept = set()
+    i = lengths.index(max(lengths)) if lengths else None
+    while i is not None:
+        kept.add(i)
+        i = previous[i]
+    return [i for i in range(len(market_caps)) if i not in kept]
+
+def validate_coin_data(coin_datums):
+    """Runs sanity checks over a snapshot.
+
+    Flags rows whose market cap is not within MARKET_CAP_TOLERANCE
+    of price * circulating supply. Of the remaining rows with a
+    market cap, flags those found by find_rank_order_outliers.
+    Rows with missing values are skipped for the checks that need
+    them. Each coin dictionary gets a "flagged" key so the result
+    reaches the CSV and database output.
+
+    Args:
+        coin_datums: list of dictionaries. Each dictionary contains
+        the data for each coin.
+
+    Returns:
+        A sorted list of the indices of flagged rows.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    flagged = set()
+    ranked = []  # indices of rows taking part in the rank order check
+    for index, coin_data in enumerate(coin_datums):
+        price = coin_data["price(USD)"]
+        market_cap = coin_data["market_cap(USD)"]
+        circulating_supply = coin_data["circulating_supply"]
+        if None not in (price, market_cap, circulating_supply) and market_cap > 0:
+            if abs(price * circulating_supply - market_cap) > MARKET_CAP_TOLERANCE * market_cap:
+                logger.warning("Market cap does not match price * supply for row " + str(index) + " " + str(coin_data["name"]) + ".")
+                flagged.add(index)
+                continue
+        if market_cap is not None:
+            ranked.append(index)
+
+    for position in find_rank_order_outliers([coin_datums[index]["market_cap(USD)"] for index in ranked]):
+        index = ranked[position]
+        logger.warning("Market cap out of rank order for row " + str(index) + " " + str(coin_datums[index]["name"]) + ".")
+        flagged.add(index)
+
+    for index, coin_data in enumerate(coin_datums):
+        coin_data["flagged"] = index in flagged
+    logger.info(str(len(flagged)) + " of " + str(len(coin_datums)) + " rows flagged by Validate Coin Data.")
+    logger.debug("Validate Coin Data complete.")
+    return sorted(flagged)
+
 def write_to_csv(coin_datums):
     """Writes data to csv file.
 
     Writes the data collected to a csv file. The columns are:
     name, symbol, price(USD), change24h, change7d, market_cap(USD),
-    volume24h(USD), circulating_supply.
+    volume24h(USD), circulating_supply and, once validate_coin_data
+    has run, flagged.
 
     Args:
         coin_datums: list of dictionaries. Each dictionary contains
@@ -500,13 +776,14 @@ def insert_market_data(conn, coin_data, cryptocurrencies_row_id):
 
     Args:
         conn: sqlite3 database connection object.
-        coin_data: data scraped for one coin.
+        coin_data: data scraped for one coin. The 'flagged' field is
+        stored as NULL if validate_coin_data has not been run.
     """
-    sql_market_data_insert = ''' INSERT INTO market_data(scrape_datetime,price_USD,change24h,change7d,market_cap_USD,volume24h_USD,circulating_supply,cryptocurrencies_id)
-                                VALUES(?,?,?,?,?,?,?,?) '''
+    sql_market_data_insert = ''' INSERT INTO market_data(scrape_datetime,price_USD,change24h,change7d,market_cap_USD,volume24h_USD,circulating_supply,flagged,cryptocurrencies_id)
+                                VALUES(?,?,?,?,?,?,?,?,?) '''
     cur = conn.cursor()
     scrape_time = str(datetime.now())
-    datum = (scrape_time,coin_data["price(USD)"],coin_data["change24h"],coin_data["change7d"],coin_data["market_cap(USD)"],coin_data["volume24h(USD)"],coin_data["circulating_supply"],cryptocurrencies_row_id)
+    datum = (scrape_time,coin_data["price(USD)"],coin_data["change24h"],coin_data["change7d"],coin_data["market_cap(USD)"],coin_data["volume24h(USD)"],coin_data["circulating_supply"],coin_data.get("flagged"),cryptocurrencies_row_id)
     cur.execute(sql_market_data_insert, datum)
     conn.commit()
 
@@ -517,7 +794,8 @@ def write_to_db(coin_datums):
     includes two tables, 'cryptocurrencies' and 'market_data'.
     The 'cryptocurrencies' table contains fields for the coin name
     and symbol. The 'market_data' contains fields for price(USD), change24h,
-    change7d, market_cap(USD), volume24h(USD) and circulating_supply.
+    change7d, market_cap(USD), volume24h(USD), circulating_supply and
+    flagged, which is 1 for rows flagged by validate_coin_data.
 
     Args:
         coin_datums: list of dictionaries. Each dictionary contains
@@ -559,7 +837,7 @@ def get_top_n_coin_data(table_rows, driver):
         logger.error(error)
         sys.exit(1)
 
-    result = []
+    raw_rows = []
     for index in range(TOP_N):
 
         if row_not_loaded(table_rows[index]):
@@ -568,16 +846,8 @@ def get_top_n_coin_data(table_rows, driver):
         
         columns = table_rows[index].findChildren('td')  # maybe AttributeError, IndexError
 
-        coin_data = {}
-        coin_data["name"] = get_coin_name(columns)
-        coin_data["symbol"] = get_coin_symbol(columns)
-        coin_data["price(USD)"] = get_coin_price(columns)
-        coin_data["change24h"] = get_coin_change24h(columns)
-        coin_data["change7d"] = get_coin_change7d(columns)
-        coin_data["market_cap(USD)"] = get_coin_market_cap(columns)
-        coin_data["volume24h(USD)"] = get_coin_volume24h(columns)
-        coin_data["circulating_supply"] = get_coin_circulating_supply(columns)
-        result.append(coin_data)
+        raw_rows.append(get_raw_coin_cells(columns))
+    result = normalize_coin_data(raw_rows)
     logger.debug("Get Top N Coin Data complete.")
     return result
 
@@ -587,6 +857,7 @@ def main():
     try:
         table_rows = get_table_with_data(html)
         coin_datums = get_top_n_coin_data(table_rows, driver)
+        validate_coin_data(coin_datums)
         write_to_csv(coin_datums)
         write_to_db(coin_datums)
     except (AttributeError, IndexError):
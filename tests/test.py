@@ -1,9 +1,12 @@
 import unittest
 from unittest.mock import MagicMock
+from bs4 import BeautifulSoup
 from scraper.scraper import get_table_with_data, row_not_loaded, \
                             reload_table_rows, get_coin_name, get_coin_symbol, \
                             get_coin_price, get_coin_change24h, get_coin_change7d, \
-                            get_coin_market_cap, get_coin_volume24h, get_coin_circulating_supply
+                            get_coin_market_cap, get_coin_volume24h, get_coin_circulating_supply, \
+                            get_raw_coin_cells, get_coin_change24h_text, normalize_column, normalize_coin_data, \
+                            validate_coin_data, find_rank_order_outliers, CURRENCY_PATTERN, SUPPLY_PATTERN
 
 
 class TestStringMethods(unittest.TestCase):
@@ -52,5 +55,72 @@ class TestStringMethods(unittest.TestCase):
 
     def test_get_coin_circulating_supply_result_none(self):
         self.assertIsNone(get_coin_circulating_supply([]))
-    
 
+    def test_get_raw_coin_cells_result_none(self):
+        raw = get_raw_coin_cells([])
+        self.assertTrue(all(value is None for value in raw.values()))
+
+    def test_normalize_column(self):
+        texts = ["$1,234.5", None, "$abc"]
+        self.assertEqual(normalize_column(texts, CURRENCY_PATTERN, float), [1234.5, None, None])
+
+    def test_normalize_column_circulating_supply(self):
+        texts = ["18,724,512 BTC", "115,932,470 ETH"]
+        self.assertEqual(normalize_column(texts, SUPPLY_PATTERN, int), [18724512, 115932470])
+
+    def test_normalize_coin_data(self):
+        raw_rows = [{"name": "Bitcoin", "symbol": "BTC", "price(USD)": "$50,000.00",
+                     "change24h": "-1.25%", "change7d": "3.50%", "market_cap(USD)": "$936,225,600,000",
+                     "volume24h(USD)": "$40,000,000,000", "circulating_supply": "18,724,512 BTC"}]
+        coin_data = normalize_coin_data(raw_rows)[0]
+        self.assertEqual(coin_data["name"], "Bitcoin")
+        self.assertEqual(coin_data["price(USD)"], 50000.0)
+        self.assertEqual(coin_data["change24h"], -1.25)
+        self.assertEqual(coin_data["change7d"], 3.5)
+        self.assertEqual(coin_data["market_cap(USD)"], 936225600000)
+        self.assertEqual(coin_data["circulating_supply"], 18724512)
+
+    def test_validate_coin_data(self):
+        coin_datums = [
+            {"name": "A", "price(USD)": 10.0, "market_cap(USD)": 1000, "circulating_supply": 100},
+            {"name": "B", "price(USD)": 10.0, "market_cap(USD)": 500, "circulating_supply": 10},
+            {"name": "C", "price(USD)": 1.0, "market_cap(USD)": 800, "circulating_supply": 800},
+            {"name": "D", "price(USD)": None, "market_cap(USD)": None, "circulating_supply": None},
+            {"name": "E", "price(USD)": 1.0, "market_cap(USD)": 2000, "circulating_supply": 2000},
+        ]
+        self.assertEqual(validate_coin_data(coin_datums), [1, 4])
+        self.assertEqual([coin_data["flagged"] for coin_data in coin_datums], [False, True, False, False, True])
+
+    def test_validate_coin_data_low_outlier(self):
+        coin_datums = [{"name": str(market_cap), "price(USD)": 1.0, "market_cap(USD)": market_cap,
+                        "circulating_supply": market_cap} for market_cap in [1000, 900, 10, 800, 700, 600, 500]]
+        self.assertEqual(validate_coin_data(coin_datums), [2])
+
+    def test_find_rank_order_outliers(self):
+        self.assertEqual(find_rank_order_outliers([]), [])
+        self.assertEqual(find_rank_order_outliers([3, 3, 2, 1]), [])
+        self.assertEqual(find_rank_order_outliers([5, 9, 4, 3]), [1])
+
+    def test_get_raw_coin_cells(self):
+        html = '<tr><td></td><td>1</td><td><p>Bitcoin</p><p>BTC</p></td><td><a>$50,000.00</a></td>' \
+               '<td><span><span class="icon-Caret-down"></span>1.25%</span></td>' \
+               '<td><span><span class="icon-Caret-up"></span>3.50%</span></td>' \
+               '<td><span>$936.23B</span><span>$936,225,600,000</span></td>' \
+               '<td><a><p>$40,000,000,000</p></a></td><td><p>18,724,512 BTC</p></td></tr>'
+        columns = BeautifulSoup(html, features="html.parser").findChildren('td')
+        coin_data = normalize_coin_data([get_raw_coin_cells(columns)])[0]
+        self.assertEqual(coin_data, {"name": "Bitcoin", "symbol": "BTC", "price(USD)": 50000.0,
+                                     "change24h": -1.25, "change7d": 3.5, "market_cap(USD)": 936225600000,
+                                     "volume24h(USD)": 40000000000, "circulating_supply": 18724512})
+
+    def test_get_coin_change24h_up(self):
+        html = '<td></td><td></td><td></td><td></td><td><span><span class="icon-Caret-up"></span> 1.25%</span></td>'
+        columns = BeautifulSoup(html, features="html.parser").findChildren('td')
+        self.assertEqual(get_coin_change24h_text(columns), "1.25%")
+        self.assertEqual(get_coin_change24h(columns), 1.25)
+
+    def test_get_coin_change24h_down(self):
+        html = '<td></td><td></td><td></td><td></td><td><span><span class="icon-Caret-down"></span> 1.25%</span></td>'
+        columns = BeautifulSoup(html, features="html.parser").findChildren('td')
+        self.assertEqual(get_coin_change24h_text(columns), "-1.25%")
+        self.assertEqual(get_coin_change24h(columns), -1.25)